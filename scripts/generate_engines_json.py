@@ -20,29 +20,56 @@ import hashlib
 import json
 import sys
 from datetime import datetime, timezone
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass
 from pathlib import Path
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-@dataclass
+
+@dataclass(slots=True)
 class PlatformData:
     url: str
     signature: str
     size: int
 
+    def to_dict(self) -> dict:
+        return {"url": self.url, "signature": self.signature, "size": self.size}
+
 
-@dataclass
+@dataclass(slots=True)
 class Release:
     version: str
     pub_date: str
     platforms: dict[str, PlatformData]
 
+    def to_dict(self) -> dict:
+        """Build the manifest dict in one pass (no deep copy like asdict())"""
+        return {
+            "version": self.version,
+            "pub_date": self.pub_date,
+            "platforms": {name: data.to_dict() for name, data in self.platforms.items()},
+        }
+
 
 def get_file_size(file_path: Path) -> int:
-    """Get file size in bytes"""
-    if file_path.exists():
+    """Get file size in bytes (0 if the file doesn't exist)"""
+    try:
         return file_path.stat().st_size
-    return 0
+    except FileNotFoundError:
+        return 0
+
+
+def write_engines_json(output: Path, engines_data: Release) -> None:
+    """Write engines.json, using orjson when it is installed"""
+    if orjson is not None:
+        # orjson serializes dataclasses natively, no asdict() pass needed
+        output.write_bytes(orjson.dumps(engines_data, option=orjson.OPT_INDENT_2))
+    else:
+        # Serialize up front and write once; json.dump issues a write per token
+        output.write_text(json.dumps(engines_data.to_dict(), indent=2))
 
 
 def generate_engines_json(
@@ -148,8 +175,7 @@ def main():
         )
         args.output.parent.mkdir(parents=True, exist_ok=True)
 
-        with open(args.output, "w") as f:
-            json.dump(asdict(engines_data), f, indent=4)
+        write_engines_json(args.output, engines_data)
 
         print(f"\nEngines.json written to: {args.output}")
         print(f"Size: {args.output.stat().st_size} bytes")
@@ -5,11 +5,12 @@ This script signs a bundle archive using an Ed25519 private key.
 The signature can be verified using the corresponding public key
 embedded in the application.
 
-Usage: python3 sign.py <bundle_file> [private_key_file]
+Usage: python3 sign.py [--raw] <bundle_file> [private_key_file]
 """
 
 import argparse
 import hashlib
+import os
 import sys
 from pathlib import Path
 
@@ -20,23 +21,29 @@ except ImportError:
     print("Install it with: pip install cryptography", file=sys.stderr)
     sys.exit(1)
 
+# Read size for hashing bundles on Pythons without hashlib.file_digest
+HASH_CHUNK_SIZE = 1 << 20
 
-def load_private_key(key_file: Path) -> ed25519.Ed25519PrivateKey:
+
+def load_private_key(key_file: Path, raw: bool = False) -> ed25519.Ed25519PrivateKey:
     """
-    Load Ed25519 private key from hex file.
+    Load Ed25519 private key from hex (or raw binary) file.
 
     Args:
         key_file: Path to private key file containing hex string
+        raw: Key file contains the raw 32 key bytes instead of hex
 
     Returns:
         Ed25519 private key object
     """
     try:
-        # Read the private key hex
-        private_key_hex = key_file.read_text().strip()
+        key_data = key_file.read_bytes()
 
-        # Convert hex to bytes
-        private_key_bytes = bytes.fromhex(private_key_hex)
+        if raw:
+            private_key_bytes = key_data
+        else:
+            # Convert hex to bytes
+            private_key_bytes = bytes.fromhex(key_data.strip().decode("ascii"))
 
         # Load the private key
         private_key = ed25519.Ed25519PrivateKey.from_private_bytes(private_key_bytes)
@@ -47,28 +54,51 @@ def load_private_key(key_file: Path) -> ed25519.Ed25519PrivateKey:
         sys.exit(1)
 
 
-def sign_bundle(bundle_file: Path, private_key: ed25519.Ed25519PrivateKey) -> bytes:
+def hash_bundle(bundle_file: Path) -> bytes:
     """
-    Sign a bundle file with Ed25519 private key.
+    Compute the SHA256 digest of a bundle file in a single streaming pass.
 
     Args:
-        bundle_file: Path to bundle file to sign
-        private_key: Ed25519 private key
+        bundle_file: Path to bundle file to hash
 
     Returns:
-        Signature bytes
+        SHA256 digest bytes
     """
     try:
-        # Read the bundle file
-        bundle_data = bundle_file.read_bytes()
+        with bundle_file.open("rb") as f:
+            # Hint aggressive read-ahead for the sequential read (Linux only)
+            if hasattr(os, "posix_fadvise"):
+                try:
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                except OSError:
+                    pass
+
+            if hasattr(hashlib, "file_digest"):  # Python 3.11+
+                return hashlib.file_digest(f, "sha256").digest()
+
+            hasher = hashlib.sha256()
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+            return hasher.digest()
+    except Exception as e:
+        print(f"ERROR: Failed to hash bundle: {e}", file=sys.stderr)
+        sys.exit(1)
 
-        # Hash the bundle data with SHA256 (to match Rust verification logic)
-        bundle_hash = hashlib.sha256(bundle_data).digest()
 
-        # Sign the hash (not the raw data)
-        signature = private_key.sign(bundle_hash)
+def sign_bundle(bundle_hash: bytes, private_key: ed25519.Ed25519PrivateKey) -> bytes:
+    """
+    Sign a bundle digest with Ed25519 private key.
+
+    Args:
+        bundle_hash: SHA256 digest of the bundle (to match Rust verification logic)
+        private_key: Ed25519 private key
 
-        return signature
+    Returns:
+        Signature bytes
+    """
+    try:
+        # Sign the hash (not the raw data)
+        return private_key.sign(bundle_hash)
     except Exception as e:
         print(f"ERROR: Failed to sign bundle: {e}", file=sys.stderr)
         sys.exit(1)
@@ -88,6 +118,11 @@ def main():
         default=None,
         help="Path to private key file (default: ../keys/bundle_signing_key.private relative to script)"
     )
+    parser.add_argument(
+        "--raw",
+        action="store_true",
+        help="Private key file contains the raw 32-byte key instead of hex"
+    )
 
     args = parser.parse_args()
 
@@ -112,10 +147,14 @@ def main():
     print(f"==> Signing bundle: {bundle_file}")
 
     # Load private key
-    private_key = load_private_key(private_key_file)
+    private_key = load_private_key(private_key_file, raw=args.raw)
+
+    # Hash the bundle once; the digest is both signed and reported as checksum
+    bundle_hash = hash_bundle(bundle_file)
+    print(f"SHA256: {bundle_hash.hex()}")
 
     # Sign the bundle
-    signature = sign_bundle(bundle_file, private_key)
+    signature = sign_bundle(bundle_hash, private_key)
 
     # Convert signature to hex
     signature_hex = signature.hex()
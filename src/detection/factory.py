@@ -8,13 +8,22 @@ DETECTION_TYPES: dict[str, type[BaseDetector]] = {
     "hand_near_mouth": HandNearMouthDetector,
 }
 
+# One shared detector per type, so the MediaPipe engine is only acquired once
+_detector_instances: dict[str, BaseDetector] = {}
+
 
 def create_detector(detection_type: str = "hand_near_mouth") -> BaseDetector:
     """
     Create a detector instance based on detection type.
+
+    Detectors are cached per type, so repeated calls return the same instance.
     Raises:
         ValueError: If detection_type is not supported
     """
+    detector = _detector_instances.get(detection_type)
+    if detector is not None:
+        return detector
+
     if detection_type not in DETECTION_TYPES:
         available_types = ", ".join(DETECTION_TYPES.keys())
         raise ValueError(
@@ -22,7 +31,10 @@ def create_detector(detection_type: str = "hand_near_mouth") -> BaseDetector:
         )
 
     detector_class = DETECTION_TYPES[detection_type]
-    return detector_class()
+    detector = detector_class()
+    _detector_instances[detection_type] = detector
+
+    return detector
 
 
 def get_available_detection_types() -> list[str]:
@@ -1,17 +1,46 @@
 import logging
+import math
 
 import numpy as np
 
 from detection.base import BaseDetector
-from mediapipe_engine import Detection, get_engine
+from jit import njit
+from mediapipe_engine import FACE_LANDMARKS, Detection, get_engine
 
 logger = logging.getLogger(__name__)
 
-FINGERTIP_INDICES = [4, 8, 12, 16, 20]
+FINGERTIP_INDICES = np.array([4, 8, 12, 16, 20], dtype=np.intp)
 MOUTH_OPEN_THRESHOLD = 0.30
 HAND_MOUTH_DISTANCE_THRESHOLD = 0.35
 
 
+@njit(cache=True, fastmath=True)
+def _max_confidence(
+    fingertips: np.ndarray,
+    mouth_x: float,
+    mouth_y: float,
+    scale_factor: float,
+    threshold: float,
+) -> float:
+    """Confidence of the fingertip closest to the mouth, 0.0 if none is in range"""
+    dx = fingertips[:, 0] - mouth_x
+    dy = fingertips[:, 1] - mouth_y
+    min_distance_sq = (dx * dx + dy * dy).min()
+
+    # Compare in squared space; only take the sqrt when a fingertip is in range
+    if min_distance_sq >= (threshold * scale_factor) ** 2:
+        return 0.0
+
+    return 1.0 - math.sqrt(min_distance_sq) / (scale_factor * threshold)
+
+
+def _stack_fingertips(hand_landmarks: np.ndarray) -> np.ndarray:
+    """Gather the fingertip (x, y) of every hand into one contiguous (N, 2) float32 array"""
+    # (H, 21, 3): one fancy-indexed gather for all hands
+    fingertips = hand_landmarks[:, FINGERTIP_INDICES, :2]
+    return np.ascontiguousarray(fingertips, dtype=np.float32).reshape(-1, 2)
+
+
 class HandNearMouthDetector(BaseDetector):
     """Detector for hand-near-mouth behavior (nail biting, etc.)"""
 
@@ -19,51 +48,56 @@ class HandNearMouthDetector(BaseDetector):
         super().__init__()
         self.engine = get_engine()
 
+        # Bind the per-frame engine helper once instead of on every detect() call
+        self._get_features = self.engine.get_features
+
+        # Warm up the kernels so the first real frame doesn't pay the JIT cost
+        _max_confidence(
+            np.zeros((1, 2), dtype=np.float32), 0.0, 0.0, 1.0, HAND_MOUTH_DISTANCE_THRESHOLD
+        )
+        self._get_features(np.zeros((FACE_LANDMARKS, 3), dtype=np.float32))
+
     @property
     def detection_type(self) -> str:
         return "hand_near_mouth"
 
     def detect(self, detection: Detection) -> tuple[bool, float]:
         """Check for hand near mouth in a single detection"""
-        if not detection.face_landmarks or not detection.hand_landmarks:
+        # No hands is the common case, so check it before touching the face
+        if detection.hand_landmarks is None or detection.face_landmarks is None:
             return False, 0.0
 
         face_landmarks = detection.face_landmarks
+        debug = logger.isEnabledFor(logging.DEBUG)
 
-        mouth_openness = self.engine.get_mouth_openness(face_landmarks)
+        # Mouth center, scale and openness share landmarks, so compute them together
+        mouth_center, scale_factor, mouth_openness = self._get_features(face_landmarks)
         if mouth_openness > MOUTH_OPEN_THRESHOLD:
-            logger.debug(f"Skipping frame: mouth open (openness={mouth_openness:.2f})")
+            if debug:
+                logger.debug(f"Skipping frame: mouth open (openness={mouth_openness:.2f})")
             return False, 0.0
-        logger.debug(f"Mouth openess: {mouth_openness:.2f}")
+        if debug:
+            logger.debug(f"Mouth openess: {mouth_openness:.2f}")
 
-        mouth_center = self.engine.get_mouth_center(face_landmarks)
-        scale_factor = self.engine.get_scale_factor(face_landmarks)
         threshold = HAND_MOUTH_DISTANCE_THRESHOLD
 
-        max_confidence = 0.0
-
-        for hand in detection.hand_landmarks:
-            for fingertip_idx in FINGERTIP_INDICES:
-                fingertip = hand[fingertip_idx]
-
-                distance = np.sqrt(
-                    (fingertip[0] - mouth_center[0]) ** 2
-                    + (fingertip[1] - mouth_center[1]) ** 2
-                )
-
-                normalized_distance = distance / scale_factor
-
-                if normalized_distance < threshold:
-                    confidence = 1.0 - (normalized_distance / threshold)
-                    max_confidence = max(max_confidence, confidence)
-                    logger.debug(
-                        f"Fingertip {fingertip_idx} near mouth: "
-                        f"distance={normalized_distance:.3f}, threshold={threshold}"
-                    )
+        fingertips = _stack_fingertips(detection.hand_landmarks)
+        max_confidence = float(
+            _max_confidence(
+                fingertips, mouth_center[0], mouth_center[1], scale_factor, threshold
+            )
+        )
 
         is_detected = max_confidence > 0.0
 
-        if is_detected:
+        if is_detected and debug:
+            # The kernel only reports the closest fingertip; recover its distance
+            logger.debug(
+                f"Closest fingertip near mouth: "
+                f"distance={(1.0 - max_confidence) * threshold:.3f}, threshold={threshold}"
+            )
+
+        if is_detected and logger.isEnabledFor(logging.INFO):
             logger.info(
                 f"Hand near mouth detected with confidence {max_confidence:.2f}"
             )
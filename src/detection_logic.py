@@ -28,6 +28,11 @@ class DetectionLogic:
     ):
         self.detector = create_detector(detection_type)
 
+        # Forward straight to the detector's bound methods, skipping the
+        # wrapper frames below on the per-frame path
+        self.detect_single = self.detector.detect  # pyright: ignore
+        self.process_frame = self.detector.process_frame  # pyright: ignore
+
     @property
     def detection_type(self) -> str:
         """Get the current detection type"""
@@ -42,7 +47,7 @@ class DetectionLogic:
         return self.detector.process_frame(frame)
 
 
-_logic_instance: DetectionLogic | None = None
+_logic_instances: dict[str, DetectionLogic] = {}
 
 
 def get_detection_logic(detection_type: str = "hand_near_mouth") -> DetectionLogic:
@@ -55,10 +60,9 @@ def get_detection_logic(detection_type: str = "hand_near_mouth") -> DetectionLog
     Returns:
         DetectionLogic instance
     """
-    global _logic_instance
-
-    # Create new instance if none exists or detection type changed
-    if _logic_instance is None or _logic_instance.detection_type != detection_type:
-        _logic_instance = DetectionLogic(detection_type)
+    logic = _logic_instances.get(detection_type)
+    if logic is None:
+        logic = DetectionLogic(detection_type)
+        _logic_instances[detection_type] = logic
 
-    return _logic_instance
+    return logic
@@ -0,0 +1,24 @@
+"""
+Optional Numba JIT support
+
+Numba is not a hard dependency of the engine. When it is installed, `njit`
+compiles the decorated function; otherwise the decorator is a no-op and the
+function runs as plain NumPy code.
+"""
+
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """Fallback for numba.njit that returns the function unchanged"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+
+        return decorator
@@ -1,25 +1,151 @@
+import atexit
 import logging
+import math
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
 
 import numpy as np
 
+from jit import njit
+
 logger = logging.getLogger(__name__)
 
+# Max frames in flight in the run() pipeline; bounds memory on long batches
+PIPELINE_DEPTH = 4
+
+# Side length of the block-averaged thumbnail compared to detect static frames
+# (cache_static); small blocks keep a fingertip entering the frame visible
+STATIC_THUMBNAIL_SIZE = 64
+
+FACE_LANDMARKS = 468
+REFINED_FACE_LANDMARKS = 478  # With refine_landmarks: adds iris landmarks
+HAND_LANDMARKS = 21
+MAX_NUM_HANDS = 2
+
+
+# Wire format of a serialized NormalizedLandmarkList entry with only x, y, z
+# set: field 1 length-delimited header (0x0A, 15), then x/y/z as tagged fixed32
+_LANDMARK_WIRE_DTYPE = np.dtype(
+    {
+        "names": ["field_tag", "length", "x_tag", "x", "y_tag", "y", "z_tag", "z"],
+        "formats": ["u1", "u1", "u1", "<f4", "u1", "<f4", "u1", "<f4"],
+        "offsets": [0, 1, 2, 3, 7, 8, 12, 13],
+        "itemsize": 17,
+    }
+)
+_LANDMARK_WIRE_TAGS = {"field_tag": 0x0A, "length": 15, "x_tag": 0x0D, "y_tag": 0x15, "z_tag": 0x1D}
+
 
 @dataclass
 class Detection:
-    face_landmarks: list | None = None
-    hand_landmarks: list | None = None
+    face_landmarks: np.ndarray | None = None  # (num_face_landmarks, 3) float32
+    hand_landmarks: np.ndarray | None = None  # (num_hands, 21, 3) float32
     confidence: float = 0.0
 
 
+def _landmarks_to_array(landmark_list, out: np.ndarray) -> np.ndarray:
+    """Copy a MediaPipe NormalizedLandmarkList into a (N, 3) float32 array in place"""
+    landmarks = landmark_list.landmark
+    num_landmarks = len(landmarks)
+
+    # Fast path: decode the serialized message in bulk instead of reading
+    # three protobuf attributes per landmark from Python
+    data = landmark_list.SerializeToString()
+    if len(data) == num_landmarks * _LANDMARK_WIRE_DTYPE.itemsize:
+        records = np.frombuffer(data, dtype=_LANDMARK_WIRE_DTYPE)
+        if all((records[name] == tag).all() for name, tag in _LANDMARK_WIRE_TAGS.items()):
+            return np.stack((records["x"], records["y"], records["z"]), axis=1, out=out)
+
+    # Landmarks carry extra fields (e.g. visibility), fall back to attribute access
+    out[:] = [(lm.x, lm.y, lm.z) for lm in landmarks]
+    return out
+
+
+@njit(cache=True, fastmath=True)
+def _mouth_center(face_landmarks: np.ndarray) -> tuple[float, float]:
+    upper_lip = face_landmarks[13]
+    lower_lip = face_landmarks[14]
+    return (
+        (float(upper_lip[0]) + float(lower_lip[0])) / 2,
+        (float(upper_lip[1]) + float(lower_lip[1])) / 2,
+    )
+
+
+@njit(cache=True, fastmath=True)
+def _scale_factor(face_landmarks: np.ndarray) -> float:
+    left_eye = face_landmarks[33]
+    right_eye = face_landmarks[263]
+
+    inter_ocular_distance = math.hypot(
+        float(right_eye[0]) - float(left_eye[0]), float(right_eye[1]) - float(left_eye[1])
+    )
+
+    return max(inter_ocular_distance, 0.05)
+
+
+@njit(cache=True, fastmath=True)
+def _face_features(face_landmarks: np.ndarray) -> tuple[tuple[float, float], float, float]:
+    """Mouth center, scale factor and mouth openness in one pass over landmarks 13, 14, 33, 263"""
+    mouth_center = _mouth_center(face_landmarks)
+    scale = _scale_factor(face_landmarks)
+
+    upper_lip = face_landmarks[13]
+    lower_lip = face_landmarks[14]
+    mouth_distance = math.hypot(
+        float(upper_lip[0]) - float(lower_lip[0]), float(upper_lip[1]) - float(lower_lip[1])
+    )
+
+    return mouth_center, scale, mouth_distance / scale
+
+
 class MediaPipeEngine:
-    def __init__(self):
+    def __init__(
+        self,
+        video_mode: bool = False,
+        refine_landmarks: bool = False,
+        cache_static: bool = False,
+        static_threshold: float = 4.0,
+    ):
+        """
+        Args:
+            video_mode: Track landmarks across frames instead of re-running full
+                detection on every frame. Frames must then be submitted in
+                temporal order, with a separate engine per stream; keep the
+                default static-image mode for unordered batches.
+            refine_landmarks: Run face mesh's iris/lip refinement sub-model.
+                Off by default since the detectors only use mouth and eye
+                corner landmarks; callers that need iris detail must opt in.
+            cache_static: Skip inference on frames nearly identical to the last
+                inferred one (paused video, still subject) and reuse its result
+            static_threshold: Max absolute difference (0-255) any block-averaged
+                thumbnail pixel may have from the last inferred frame for a frame
+                to count as identical. The default tolerates per-pixel sensor
+                noise up to a standard deviation of about 4 at 480p-720p, while a
+                fingertip-sized patch changed by 40 levels still forces inference
+        """
+        self.video_mode = video_mode
+        self.refine_landmarks = refine_landmarks
+        self.cache_static = cache_static
+        self.static_threshold = static_threshold
+
+        self.num_face_landmarks = REFINED_FACE_LANDMARKS if refine_landmarks else FACE_LANDMARKS
+        # Row layout of one frame in a run_into() landmark buffer: face, then each hand
+        self.landmarks_per_frame = self.num_face_landmarks + MAX_NUM_HANDS * HAND_LANDMARKS
+
         self.mp_hands = None
         self.mp_face_mesh = None
 
         self.hands = None
         self.face_mesh = None
+        self._face_executor: ThreadPoolExecutor | None = None
+        self._hands_executor: ThreadPoolExecutor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+        self._process_pool_workers = 0
+        self._reference_thumbnail: np.ndarray | None = None
+        self._static_cache: tuple[np.ndarray, np.ndarray] | None = None
         self._initialized = False
 
     def _lazy_init(self):
@@ -43,8 +169,8 @@ class MediaPipeEngine:
 
         try:
             self.hands = self.mp_hands.Hands(
-                static_image_mode=True,
-                max_num_hands=2,
+                static_image_mode=not self.video_mode,
+                max_num_hands=MAX_NUM_HANDS,
                 min_detection_confidence=0.5,
                 min_tracking_confidence=0.5,
             )
@@ -55,9 +181,9 @@ class MediaPipeEngine:
 
         try:
             self.face_mesh = self.mp_face_mesh.FaceMesh(
-                static_image_mode=True,
+                static_image_mode=not self.video_mode,
                 max_num_faces=1,
-                refine_landmarks=True,
+                refine_landmarks=self.refine_landmarks,
                 min_detection_confidence=0.5,
                 min_tracking_confidence=0.5,
             )
@@ -66,71 +192,315 @@ class MediaPipeEngine:
             logger.error(f"Failed to initialize face mesh model: {e}")
             raise
 
+        # One worker thread per model: frames flow through each model in order
+        # while the caller extracts landmarks; MediaPipe releases the GIL
+        # during native inference
+        self._face_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="mediapipe-face-mesh"
+        )
+        self._hands_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="mediapipe-hands"
+        )
+
         self._initialized = True
         logger.info("All MediaPipe models initialized successfully")
 
     def run(self, frames: list[np.ndarray]) -> list[Detection]:
+        # One buffer for the whole batch rather than one array per landmark list
+        num_frames = len(frames)
+        out_landmarks = np.empty((num_frames, self.landmarks_per_frame, 3), dtype=np.float32)
+        out_mask = np.empty((num_frames, 1 + MAX_NUM_HANDS), dtype=bool)
+        return self.run_into(frames, out_landmarks, out_mask)
+
+    def run_into(
+        self,
+        frames: list[np.ndarray],
+        out_landmarks: np.ndarray,
+        out_mask: np.ndarray,
+    ) -> list[Detection]:
+        """
+        Run detection and write landmarks into caller-owned buffers
+
+        Lets callers preallocate once and reuse the buffers across batches, and
+        vectorize feature extraction across all frames of a batch.
+
+        Args:
+            frames: Image frames as numpy arrays
+            out_landmarks: float32 array of shape (len(frames), self.landmarks_per_frame, 3);
+                row i holds the face landmarks followed by up to MAX_NUM_HANDS hands
+            out_mask: bool array of shape (len(frames), 1 + MAX_NUM_HANDS); column 0
+                flags a detected face, column 1 + k a detected hand k. Landmark rows
+                that aren't flagged are left untouched
+
+        Returns:
+            One Detection per frame whose landmarks are views into out_landmarks
+        """
+        num_frames = len(frames)
+        landmarks_shape = (num_frames, self.landmarks_per_frame, 3)
+        if out_landmarks.shape != landmarks_shape or out_landmarks.dtype != np.float32:
+            raise ValueError(f"out_landmarks must be float32 with shape {landmarks_shape}")
+        if out_mask.shape != (num_frames, 1 + MAX_NUM_HANDS) or out_mask.dtype != bool:
+            raise ValueError(f"out_mask must be bool with shape {(num_frames, 1 + MAX_NUM_HANDS)}")
+
+        # _lazy_init raises if any model fails to load, so the models and
+        # executors are always set past this point
         self._lazy_init()
 
-        assert self.hands is not None
-        assert self.face_mesh is not None
-
         detections = []
+        pending: deque[tuple[Future, Future] | None] = deque()
+
+        try:
+            for frame in frames:
+                # Make the frame contiguous once so the two models share one buffer
+                # instead of each converting a strided view (e.g. a crop or flip)
+                frame = np.ascontiguousarray(frame)
+
+                if self.cache_static and self._is_static_frame(frame):
+                    pending.append(None)  # Reuse the last inferred frame's result
+                else:
+                    pending.append(self._submit(frame))
+                if len(pending) >= PIPELINE_DEPTH:
+                    i = len(detections)
+                    detections.append(
+                        self._collect(pending.popleft(), out_landmarks[i], out_mask[i])
+                    )
+
+            while pending:
+                i = len(detections)
+                detections.append(self._collect(pending.popleft(), out_landmarks[i], out_mask[i]))
+        except BaseException:
+            # Don't let a later frame match against a result that was never built
+            self._reference_thumbnail = None
+            self._static_cache = None
+            raise
 
-        for frame in frames:
-            detection = Detection()
+        return detections
 
-            face_results = self.face_mesh.process(frame)
-            multi_face_landmarks = face_results.multi_face_landmarks  # pyright: ignore
-            if multi_face_landmarks:
-                face_landmarks = multi_face_landmarks[0]
-                detection.face_landmarks = [(lm.x, lm.y, lm.z) for lm in face_landmarks.landmark]
+    def _submit(self, frame: np.ndarray) -> tuple[Future, Future]:
+        # Both models are independent, so run them concurrently, and let them
+        # start on the next frames while earlier ones are extracted
+        return (
+            self._face_executor.submit(self.face_mesh.process, frame),  # pyright: ignore
+            self._hands_executor.submit(self.hands.process, frame),  # pyright: ignore
+        )
 
-            hand_results = self.hands.process(frame)
-            multi_hand_landmarks = hand_results.multi_hand_landmarks  # pyright: ignore
-            if multi_hand_landmarks:
-                detection.hand_landmarks = []
-                for hand_landmarks in multi_hand_landmarks:
-                    hand_data = [(lm.x, lm.y, lm.z) for lm in hand_landmarks.landmark]
-                    detection.hand_landmarks.append(hand_data)
+    def _is_static_frame(self, frame: np.ndarray) -> bool:
+        """Compare a downsampled copy of frame against the last inferred frame's"""
+        height, width = frame.shape[:2]
+        block_height = max(1, height // STATIC_THUMBNAIL_SIZE)
+        block_width = max(1, width // STATIC_THUMBNAIL_SIZE)
+        rows, cols = height // block_height, width // block_width
+
+        # Average each block rather than sampling one pixel from it: sensor
+        # noise shrinks by sqrt(block size), so a still subject on a webcam
+        # stays under static_threshold. Summing rows, then columns, in integers
+        # is far cheaper than a float mean over both block axes
+        cropped = frame[: rows * block_height, : cols * block_width]
+        row_sums = cropped.reshape(rows, block_height, -1).sum(axis=1, dtype=np.uint32)
+        block_sums = row_sums.reshape(rows, cols, block_width, -1).sum(axis=2, dtype=np.uint32)
+        thumbnail = block_sums.astype(np.float32) / (block_height * block_width)
+
+        # Compare per pixel against a fixed reference rather than the previous
+        # frame, so neither slow drift nor small local motion (a fingertip
+        # entering the mouth region) can keep extending a stale result
+        reference = self._reference_thumbnail
+        if (
+            reference is not None
+            and reference.shape == thumbnail.shape
+            and float(np.abs(thumbnail - reference).max()) <= self.static_threshold
+        ):
+            return True
+
+        # Results are collected in submission order, so this frame's result is
+        # the one cached by the time any frame matched against it is collected
+        self._reference_thumbnail = thumbnail
+        return False
+
+    def _collect(
+        self,
+        entry: tuple[Future, Future] | None,
+        landmarks: np.ndarray,
+        mask: np.ndarray,
+    ) -> Detection:
+        if entry is None:
+            cached_landmarks, cached_mask = self._static_cache  # pyright: ignore
+            landmarks[:] = cached_landmarks
+            mask[:] = cached_mask
+            return self._detection_from_rows(landmarks, mask)
+
+        detection = self._build_detection(*entry, landmarks, mask)
+        if self.cache_static:
+            self._static_cache = (landmarks.copy(), mask.copy())
+        return detection
+
+    def run_parallel(
+        self, frames: list[np.ndarray], num_workers: int | None = None
+    ) -> list[Detection]:
+        """
+        Run detection on independent frames sharded across worker processes
+
+        Each worker owns its own MediaPipeEngine, so no MediaPipe graph is
+        pickled; the pool is kept alive for subsequent calls. Workers are
+        started with the current Python executable, so an embedding host must
+        point multiprocessing at a real interpreter (multiprocessing.set_executable).
+
+        Args:
+            frames: Independent image frames (static images or distinct streams)
+            num_workers: Number of worker processes (default: half the CPU cores,
+                since each worker runs face mesh and hands concurrently)
+
+        Returns:
+            One Detection per frame, in input order
+        """
+        if self.video_mode:
+            raise ValueError(
+                "run_parallel requires static image mode; video frames must stay in order"
+            )
+        if not frames:
+            return []
+
+        num_workers = num_workers or _default_num_workers()
+        if self._process_pool is None or self._process_pool_workers != num_workers:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=True)
+            # Spawn rather than fork: forking after MediaPipe has started its
+            # native threads can leave the child's allocator in a broken state
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=num_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.refine_landmarks,),
+            )
+            self._process_pool_workers = num_workers
 
-            detections.append(detection)
+        chunk_size = -(-len(frames) // num_workers)
+        chunks = [frames[i : i + chunk_size] for i in range(0, len(frames), chunk_size)]
 
+        detections = []
+        for chunk_detections in self._process_pool.map(_worker_run, chunks, chunksize=1):
+            detections.extend(chunk_detections)
         return detections
 
-    def get_mouth_center(
-        self, face_landmarks: list[tuple[float, float, float]]
-    ) -> tuple[float, float]:
-        upper_lip = face_landmarks[13]
-        lower_lip = face_landmarks[14]
-        return ((upper_lip[0] + lower_lip[0]) / 2, (upper_lip[1] + lower_lip[1]) / 2)
+    def _build_detection(
+        self,
+        face_future: Future,
+        hand_future: Future,
+        landmarks: np.ndarray,
+        mask: np.ndarray,
+    ) -> Detection:
+        detection = Detection()
+        mask[:] = False
+
+        face_results = face_future.result()
+        multi_face_landmarks = face_results.multi_face_landmarks  # pyright: ignore
+        if multi_face_landmarks:
+            detection.face_landmarks = _landmarks_to_array(
+                multi_face_landmarks[0], landmarks[: self.num_face_landmarks]
+            )
+            mask[0] = True
+
+        hand_results = hand_future.result()
+        multi_hand_landmarks = hand_results.multi_hand_landmarks  # pyright: ignore
+        if multi_hand_landmarks:
+            num_hands = min(len(multi_hand_landmarks), MAX_NUM_HANDS)
+            hands = landmarks[self.num_face_landmarks :][: num_hands * HAND_LANDMARKS]
+            hands = hands.reshape(num_hands, HAND_LANDMARKS, 3)
+            for k in range(num_hands):
+                _landmarks_to_array(multi_hand_landmarks[k], hands[k])
+            detection.hand_landmarks = hands
+            mask[1 : 1 + num_hands] = True
+
+        return detection
+
+    def _detection_from_rows(self, landmarks: np.ndarray, mask: np.ndarray) -> Detection:
+        """Rebuild a Detection viewing one frame's run_into rows"""
+        detection = Detection()
+        if mask[0]:
+            detection.face_landmarks = landmarks[: self.num_face_landmarks]
+        num_hands = int(mask[1:].sum())
+        if num_hands:
+            hands = landmarks[self.num_face_landmarks :][: num_hands * HAND_LANDMARKS]
+            detection.hand_landmarks = hands.reshape(num_hands, HAND_LANDMARKS, 3)
+        return detection
+
+    def get_mouth_center(self, face_landmarks: np.ndarray) -> tuple[float, float]:
+        return _mouth_center(face_landmarks)
+
+    def get_scale_factor(self, face_landmarks: np.ndarray) -> float:
+        return _scale_factor(face_landmarks)
+
+    def get_mouth_openness(self, face_landmarks: np.ndarray) -> float:
+        return _face_features(face_landmarks)[2]
+
+    def get_features(
+        self, face_landmarks: np.ndarray
+    ) -> tuple[tuple[float, float], float, float]:
+        """Return (mouth_center, scale_factor, mouth_openness) computed together"""
+        return _face_features(face_landmarks)
+
+    def close(self):
+        """Release the MediaPipe graphs, worker threads and worker processes"""
+        self._release(wait=True)
+
+    def _release(self, wait: bool):
+        # Without wait, pools are only signalled to stop and queued work is cancelled
+        if self._process_pool:
+            self._process_pool.shutdown(wait=wait, cancel_futures=not wait)
+            self._process_pool = None
+            self._process_pool_workers = 0
+        if self._face_executor:
+            self._face_executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._face_executor = None
+        if self._hands_executor:
+            self._hands_executor.shutdown(wait=wait, cancel_futures=not wait)
+            self._hands_executor = None
+        if self.hands:
+            self.hands.close()
+            self.hands = None
+        if self.face_mesh:
+            self.face_mesh.close()
+            self.face_mesh = None
 
-    def get_scale_factor(self, face_landmarks: list[tuple[float, float, float]]) -> float:
-        left_eye = face_landmarks[33]
-        right_eye = face_landmarks[263]
+        # A re-initialized engine must not reuse a result from this session
+        self._reference_thumbnail = None
+        self._static_cache = None
 
-        inter_ocular_distance = np.sqrt(
-            (right_eye[0] - left_eye[0]) ** 2 + (right_eye[1] - left_eye[1]) ** 2
-        )
+        # A later run re-initializes the models
+        self._initialized = False
 
-        return float(max(inter_ocular_distance, 0.05))
+    def __enter__(self) -> "MediaPipeEngine":
+        return self
 
-    def get_mouth_openness(self, face_landmarks: list[tuple[float, float, float]]) -> float:
-        upper_lip = face_landmarks[13]
-        lower_lip = face_landmarks[14]
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
 
-        scale = self.get_scale_factor(face_landmarks)
-        mouth_distance = np.sqrt(
-            (upper_lip[0] - lower_lip[0]) ** 2 + (upper_lip[1] - lower_lip[1]) ** 2
-        )
+    def __del__(self):
+        # Last-resort cleanup only, so never block: a finalizer can run on any
+        # thread (including an executor worker, which can't join itself) or
+        # during interpreter shutdown. Use close() for an orderly teardown
+        try:
+            self._release(wait=False)
+        except Exception:
+            pass
 
-        return float(mouth_distance / scale)
 
-    def __del__(self):
-        if self.hands:
-            self.hands.close()
-        if self.face_mesh:
-            self.face_mesh.close()
+def _default_num_workers() -> int:
+    # MediaPipe doesn't expose its TFLite thread count, so avoid oversubscription
+    # by giving each worker's two concurrently running models a core apiece
+    return max(1, (os.cpu_count() or 1) // 2)
+
+
+# Per-process engine for run_parallel workers, built by the pool initializer
+_worker_engine: MediaPipeEngine | None = None
+
+
+def _init_worker(refine_landmarks: bool) -> None:
+    global _worker_engine
+    _worker_engine = MediaPipeEngine(refine_landmarks=refine_landmarks)
+
+
+def _worker_run(frames: list[np.ndarray]) -> list[Detection]:
+    return _worker_engine.run(frames)  # pyright: ignore
 
 
 _engine_instance: MediaPipeEngine | None = None
@@ -140,4 +510,6 @@ def get_engine() -> MediaPipeEngine:
     global _engine_instance
     if _engine_instance is None:
         _engine_instance = MediaPipeEngine()
+        # Deterministic teardown of the native graphs at exit instead of __del__
+        atexit.register(_engine_instance.close)
     return _engine_instance